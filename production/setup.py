@@ -44,9 +44,9 @@ setup(
         "pydantic>=2.5.0",
         "pydantic-settings>=2.1.0",
         "python-dotenv>=1.0.0",
-        "PyJWT>=2.10.0",
-        "passlib[bcrypt]>=1.7.4",
+        "bcrypt>=4.0.0",
         "email-validator>=2.1.0",
+        "orjson>=3.9.0",
     ],
     extras_require={
         "dev": [
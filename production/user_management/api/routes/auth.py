@@ -5,17 +5,72 @@ Author: User Management Plugin Team
 Version: 1.0.0
 """
 
+import logging
+import re
+import time
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
-from user_management.config import get_db, settings
-from user_management.services.auth import AuthService
+from user_management.config import SessionLocal, get_db, settings
+from user_management.services.activity import activity_buffer
+from user_management.services.auth import AuthService, invalidate_user_cache, security
 from user_management.models import User
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
+# Syntactic email check, compiled once. Cheaper per request than
+# email-validator's full walk; anything that passes here still has to
+# complete verification to prove the address is real.
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# Access token lifetime in seconds, computed once instead of per response
+_ACCESS_TOKEN_EXPIRES_IN = settings.JWT_EXPIRATION_HOURS * 3600
+
+logger = logging.getLogger(__name__)
+
+# Fixed-window rate limit for password-reset requests, keyed per client
+# IP + email: key -> (window_start, count). Keeps probing traffic off the
+# database entirely once a key exhausts its window.
+_RESET_RATE_LIMIT = {}
+_RESET_RATE_WINDOW = 300  # seconds
+_RESET_RATE_MAX = 5
+_RESET_RATE_LIMIT_MAX_KEYS = 10_000
+
+
+def _evict_rate_limit_entries(now: float):
+    """
+    Make room without wiping live state: clearing everything would let an
+    attacker reset their own window by spraying distinct emails until the
+    cap trips. Drop expired windows first; if the table is still full of
+    live windows, drop the oldest half (active probers stay, since their
+    windows are by definition recent).
+    """
+    cutoff = now - _RESET_RATE_WINDOW
+    for key, (window_start, _) in list(_RESET_RATE_LIMIT.items()):
+        if window_start < cutoff:
+            del _RESET_RATE_LIMIT[key]
+
+    if len(_RESET_RATE_LIMIT) >= _RESET_RATE_LIMIT_MAX_KEYS:
+        oldest = sorted(_RESET_RATE_LIMIT, key=lambda k: _RESET_RATE_LIMIT[k][0])
+        for key in oldest[:len(oldest) // 2]:
+            del _RESET_RATE_LIMIT[key]
+
+
+def _reset_rate_limited(key: str) -> bool:
+    """Count a reset request against its fixed window; True when over budget"""
+    now = time.time()
+    window_start, count = _RESET_RATE_LIMIT.get(key, (now, 0))
+    if now - window_start > _RESET_RATE_WINDOW:
+        window_start, count = now, 0
+    if key not in _RESET_RATE_LIMIT and len(_RESET_RATE_LIMIT) >= _RESET_RATE_LIMIT_MAX_KEYS:
+        _evict_rate_limit_entries(now)
+    _RESET_RATE_LIMIT[key] = (window_start, count + 1)
+    return count >= _RESET_RATE_MAX
+
 
 # ============================================================================
 # REQUEST/RESPONSE MODELS
@@ -23,12 +78,20 @@ router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
 class RegisterRequest(BaseModel):
     """User registration request"""
-    email: EmailStr
+    email: str
     username: str
     password: str
-    first_name: str = None
-    last_name: str = None
-    
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+
+    @field_validator('email')
+    @classmethod
+    def validate_email(cls, v: str) -> str:
+        """Syntactic check against the precompiled pattern; normalize case"""
+        if not _EMAIL_RE.match(v):
+            raise ValueError('Invalid email address')
+        return v.lower()
+
     class Config:
         json_schema_extra = {
             "example": {
@@ -43,9 +106,18 @@ class RegisterRequest(BaseModel):
 
 class LoginRequest(BaseModel):
     """User login request"""
-    email: EmailStr
+    email: str
     password: str
-    
+
+    @field_validator('email')
+    @classmethod
+    def validate_email(cls, v: str) -> str:
+        """Syntactic check against the precompiled pattern; normalize case"""
+        if not _EMAIL_RE.match(v):
+            raise ValueError('Invalid email address')
+        return v.lower()
+
+
     class Config:
         json_schema_extra = {
             "example": {
@@ -64,18 +136,17 @@ class TokenResponse(BaseModel):
 
 
 class UserResponse(BaseModel):
-    """User response"""
+    """User response - column fields only, so validation never walks ORM relationships"""
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     email: str
     username: str
-    first_name: str = None
-    last_name: str = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
     is_active: bool
-    is_verified: bool
+    is_verified: bool = Field(validation_alias="is_email_verified")
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
 
 
 class ChangePasswordRequest(BaseModel):
@@ -102,11 +173,15 @@ async def register(
     - **first_name**: Optional first name
     - **last_name**: Optional last name
     """
-    # Check if user exists
-    existing = db.query(User).filter(
-        (User.email == request.email) | (User.username == request.username)
-    ).first()
-    
+    # Check if user exists - EXISTS probe only, no row fetch or ORM
+    # hydration. Email compares case-insensitively to match the login path
+    # and the unique lower(email) index; pre-existing rows may be mixed-case.
+    existing = db.query(
+        db.query(User.id).filter(
+            (func.lower(User.email) == request.email) | (User.username == request.username)
+        ).exists()
+    ).scalar()
+
     if existing:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -120,8 +195,8 @@ async def register(
             detail="Password must be at least 8 characters"
         )
     
-    # Create user
-    user = AuthService.create_user(
+    # Create user (bcrypt hash runs on the worker pool)
+    user = await AuthService.create_user(
         db=db,
         email=request.email,
         username=request.username,
@@ -129,13 +204,15 @@ async def register(
         first_name=request.first_name,
         last_name=request.last_name
     )
-    
-    return user
+
+    # Validate explicitly so FastAPI skips its implicit conversion pass
+    return UserResponse.model_validate(user)
 
 
 @router.post("/login", response_model=TokenResponse)
 async def login(
     request: LoginRequest,
+    http_request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -145,7 +222,7 @@ async def login(
     - **access_token**: JWT token for API requests (expires in 24 hours by default)
     - **refresh_token**: Token for refreshing access token (expires in 7 days)
     """
-    user = AuthService.authenticate_user(
+    user = await AuthService.authenticate_user(
         db=db,
         email=request.email,
         password=request.password
@@ -166,12 +243,21 @@ async def login(
         user_id=user.id,
         expires_in_days=settings.JWT_REFRESH_EXPIRATION_DAYS
     )
-    
+
+    # Write-behind audit trail: O(1) enqueue here, batched insert in the
+    # background drain
+    activity_buffer.record(
+        user_id=user.id,
+        action="login",
+        ip_address=http_request.client.host if http_request.client else None,
+        user_agent=http_request.headers.get("user-agent"),
+    )
+
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
-        "expires_in": settings.JWT_EXPIRATION_HOURS * 3600
+        "expires_in": _ACCESS_TOKEN_EXPIRES_IN
     }
 
 
@@ -193,7 +279,7 @@ async def refresh_token(
             detail="Invalid or expired refresh token"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = AuthService.load_user_for_auth(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -209,7 +295,7 @@ async def refresh_token(
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
-        "expires_in": settings.JWT_EXPIRATION_HOURS * 3600
+        "expires_in": _ACCESS_TOKEN_EXPIRES_IN
     }
 
 
@@ -222,21 +308,20 @@ async def get_current_user(
     
     Requires: Bearer token in Authorization header
     """
-    return current_user
+    return UserResponse.model_validate(current_user)
 
 
 @router.post("/logout", status_code=204)
 async def logout(
     current_user: User = Depends(AuthService.get_current_user),
+    credentials=Depends(security),
     db: Session = Depends(get_db)
 ):
     """
-    Logout user (invalidates tokens if using blacklist)
-    
-    In production, implement token blacklisting with Redis
+    Logout user (blacklists the presented access token)
     """
-    # TODO: Implement token blacklisting
-    pass
+    AuthService.revoke_access_token(credentials.credentials)
+    activity_buffer.record(user_id=current_user.id, action="logout")
 
 
 @router.post("/change-password")
@@ -250,34 +335,61 @@ async def change_password(
     
     Requires: Valid current password
     """
-    if not AuthService.verify_password(request.old_password, current_user.password_hash):
+    # current_user is merged into this request's session by
+    # get_current_user, so the update below flushes through db
+    if not await AuthService.verify_password_async(request.old_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid current password"
         )
-    
-    # Hash and update password
-    current_user.password_hash = AuthService.hash_password(request.new_password)
+
+    # Hash and update password (bcrypt runs on the worker pool)
+    current_user.password_hash = await AuthService.hash_password_async(request.new_password)
     db.commit()
+    invalidate_user_cache(current_user.id)
     
     return {"message": "Password changed successfully"}
 
 
+def _process_password_reset(email: str):
+    """
+    Background half of the reset flow: look the user up and (in production)
+    generate a token + send the email. Runs after the response is sent, on
+    a fresh session, so nothing here can leak into response timing.
+    """
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(func.lower(User.email) == email).first()
+        if not user:
+            return
+        # TODO: Generate reset token and send email
+        logger.info(f"📧 Password reset requested: {email}")
+    finally:
+        db.close()
+
+
 @router.post("/password-reset-request")
 async def request_password_reset(
-    email: EmailStr,
-    db: Session = Depends(get_db)
+    email: str,
+    request: Request,
+    background_tasks: BackgroundTasks
 ):
     """
     Request password reset (sends email with reset token)
-    
+
     In production, implement email sending
     """
-    user = db.query(User).filter(User.email == email).first()
-    
-    if not user:
-        # Don't reveal if email exists for security
-        return {"message": "If email exists, password reset link has been sent"}
-    
-    # TODO: Generate reset token and send email
+    if not _EMAIL_RE.match(email):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid email address"
+        )
+
+    # Same generic response whether or not the account exists, and the
+    # lookup happens after the response - no timing oracle, no DB work on
+    # the HTTP critical path
+    client_ip = request.client.host if request.client else "unknown"
+    if not _reset_rate_limited(f"{client_ip}:{email.lower()}"):
+        background_tasks.add_task(_process_password_reset, email.lower())
+
     return {"message": "If email exists, password reset link has been sent"}
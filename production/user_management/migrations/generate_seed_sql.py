@@ -0,0 +1,118 @@
+"""
+generate_seed_sql.py - Offline seed SQL generator for user_management plugin
+Purpose: Render SYSTEM_ROLES / PERMISSIONS / ROLE_PERMISSIONS into one
+         idempotent SQL statement shipped as seed.sql
+Author: GabForge
+Version: 1.0.0
+
+The seed data is fully static, so the whole seed can be evaluated ahead of
+time into a single INSERT-with-CTEs statement that the runtime executes in
+one round-trip. Run this script whenever the seed constants change and
+commit the regenerated seed.sql:
+
+    python -m user_management.migrations.generate_seed_sql
+"""
+
+import logging
+from pathlib import Path
+
+from user_management.migrations.seed_roles_and_permissions import (
+    PERMISSIONS,
+    ROLE_PERMISSIONS,
+    SYSTEM_ROLES,
+)
+
+logger = logging.getLogger(__name__)
+
+SEED_SQL_PATH = Path(__file__).with_name("seed.sql")
+
+
+def _quote(value) -> str:
+    """Render a Python value as a SQL literal"""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, int):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def generate_seed_sql() -> str:
+    """
+    Build the full seed as one idempotent SQL statement.
+
+    The CTEs upsert permissions and roles; their RETURNING output only
+    covers freshly inserted rows, so each is unioned with the table's
+    pre-statement snapshot before resolving names to ids for the
+    role_permissions mapping. Rows are sorted so output is deterministic.
+    """
+    # created_at has a Python-side default only (no server_default), so raw
+    # SQL must supply it explicitly or the NOT NULL constraint rejects the row
+    perm_values = ",\n        ".join(
+        f"({_quote(name)}, {_quote(desc)}, {_quote(module)}, now())"
+        for module, perms in sorted(PERMISSIONS.items())
+        for name, desc in sorted(perms)
+    )
+
+    role_values = ",\n        ".join(
+        "({}, {}, {}, {}, now())".format(
+            _quote(rc["name"]),
+            _quote(rc["description"]),
+            _quote(rc["level"]),
+            _quote(rc["is_system"]),
+        )
+        for rc in SYSTEM_ROLES
+    )
+
+    mapping_values = ",\n        ".join(
+        f"({_quote(role_name)}, {_quote(perm_name)})"
+        for role_name in sorted(ROLE_PERMISSIONS)
+        for perm_name in sorted(ROLE_PERMISSIONS[role_name])
+    )
+
+    return f"""-- Generated by generate_seed_sql.py - do not edit by hand.
+-- Regenerate with: python -m user_management.migrations.generate_seed_sql
+WITH new_perms AS (
+    INSERT INTO public.permissions (name, description, module, created_at)
+    VALUES
+        {perm_values}
+    ON CONFLICT (name) DO NOTHING
+    RETURNING id, name
+),
+all_perms AS (
+    SELECT id, name FROM new_perms
+    UNION
+    SELECT id, name FROM public.permissions
+),
+new_roles AS (
+    INSERT INTO public.roles (name, description, level, is_system, created_at)
+    VALUES
+        {role_values}
+    ON CONFLICT (name) DO NOTHING
+    RETURNING id, name
+),
+all_roles AS (
+    SELECT id, name FROM new_roles
+    UNION
+    SELECT id, name FROM public.roles
+)
+INSERT INTO public.role_permissions (role_id, permission_id)
+SELECT r.id, p.id
+FROM (VALUES
+        {mapping_values}
+) AS m (role_name, perm_name)
+JOIN all_roles r ON r.name = m.role_name
+JOIN all_perms p ON p.name = m.perm_name
+ON CONFLICT DO NOTHING;
+"""
+
+
+def main():
+    """Regenerate seed.sql next to this module"""
+    sql = generate_seed_sql()
+    SEED_SQL_PATH.write_text(sql)
+    logger.info(f"✅ Wrote {SEED_SQL_PATH}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
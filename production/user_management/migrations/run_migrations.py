@@ -6,16 +6,63 @@ Version: 1.0.0
 """
 
 import logging
+from sqlalchemy import inspect, text
 from user_management.config import Base, engine
 from user_management.models import (
     User, Role, Permission, UserSession,
-    UserActivityLog, UserPreferences,
-    EmailVerificationToken, PasswordResetToken
+    UserActivityLog, UserPreferences, AuthToken
 )
 
 logger = logging.getLogger(__name__)
 
 
+# Keeps roles.permissions_cache in sync with the role_permissions table so
+# read paths can resolve a role's permission names from one column instead
+# of joining role_permissions and permissions.
+ROLE_PERMISSIONS_CACHE_DDL = """
+CREATE OR REPLACE FUNCTION public.refresh_role_permissions_cache()
+RETURNS trigger AS $$
+DECLARE
+    target_role_id integer;
+BEGIN
+    -- NEW is unassigned in DELETE row triggers (and OLD in INSERT ones),
+    -- so branch on the operation instead of COALESCE-ing across both
+    IF TG_OP = 'DELETE' THEN
+        target_role_id := OLD.role_id;
+    ELSE
+        target_role_id := NEW.role_id;
+    END IF;
+    UPDATE public.roles
+    SET permissions_cache = COALESCE(
+        (SELECT array_agg(p.name ORDER BY p.name)
+         FROM public.role_permissions rp
+         JOIN public.permissions p ON p.id = rp.permission_id
+         WHERE rp.role_id = target_role_id),
+        '{}'
+    )
+    WHERE id = target_role_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_role_permissions_cache ON public.role_permissions;
+CREATE TRIGGER trg_role_permissions_cache
+AFTER INSERT OR DELETE ON public.role_permissions
+FOR EACH ROW EXECUTE FUNCTION public.refresh_role_permissions_cache();
+
+-- Backfill so databases that predate the trigger (or had it install after
+-- mappings were written) start from an accurate cache
+UPDATE public.roles r
+SET permissions_cache = COALESCE(
+    (SELECT array_agg(p.name ORDER BY p.name)
+     FROM public.role_permissions rp
+     JOIN public.permissions p ON p.id = rp.permission_id
+     WHERE rp.role_id = r.id),
+    '{}'
+);
+"""
+
+
 def run_migrations():
     """
     Create all database tables for user_management plugin.
@@ -29,15 +76,26 @@ def run_migrations():
     - user_sessions
     - user_activity_logs
     - user_preferences
-    - email_verification_tokens
-    - password_reset_tokens
+    - auth_tokens
     """
     try:
         logger.info("🔄 Running user_management plugin migrations...")
         
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
-        
+        # Create all tables. create_all probes every table's existence with
+        # its own roundtrip, so on a fully-migrated database (the common
+        # restart case) skip it after one batched reflection of the schema.
+        # Every mapped table must be present - probing just the oldest one
+        # would skip creation of tables added in later releases.
+        existing = set(inspect(engine).get_table_names(schema='public'))
+        if all(table.name in existing for table in Base.metadata.sorted_tables):
+            logger.info("⏭️  Tables already exist - skipping create_all")
+        else:
+            Base.metadata.create_all(bind=engine)
+
+        # Install the trigger that maintains roles.permissions_cache
+        with engine.begin() as connection:
+            connection.execute(text(ROLE_PERMISSIONS_CACHE_DDL))
+
         logger.info("✅ User management migrations completed successfully!")
         logger.info("📊 Tables created:")
         logger.info("   - users")
@@ -48,8 +106,7 @@ def run_migrations():
         logger.info("   - user_sessions")
         logger.info("   - user_activity_logs")
         logger.info("   - user_preferences")
-        logger.info("   - email_verification_tokens")
-        logger.info("   - password_reset_tokens")
+        logger.info("   - auth_tokens")
         
         return True
         
@@ -0,0 +1,126 @@
+-- Generated by generate_seed_sql.py - do not edit by hand.
+-- Regenerate with: python -m user_management.migrations.generate_seed_sql
+WITH new_perms AS (
+    INSERT INTO public.permissions (name, description, module, created_at)
+    VALUES
+        ('analytics:export', 'Export analytics', 'analytics', now()),
+        ('analytics:view', 'View analytics', 'analytics', now()),
+        ('comments:approve', 'Approve comments', 'comments', now()),
+        ('comments:create', 'Create comment', 'comments', now()),
+        ('comments:delete', 'Delete comment', 'comments', now()),
+        ('comments:moderate', 'Moderate comments', 'comments', now()),
+        ('comments:read', 'Read comments', 'comments', now()),
+        ('comments:update', 'Update own comment', 'comments', now()),
+        ('posts:bulk_update', 'Bulk update posts', 'posts', now()),
+        ('posts:create', 'Create blog post', 'posts', now()),
+        ('posts:delete', 'Delete blog post', 'posts', now()),
+        ('posts:publish', 'Publish blog post', 'posts', now()),
+        ('posts:read', 'Read blog posts', 'posts', now()),
+        ('posts:schedule', 'Schedule blog post', 'posts', now()),
+        ('posts:update', 'Update blog post', 'posts', now()),
+        ('settings:manage', 'Manage system settings', 'settings', now()),
+        ('settings:manage_roles', 'Manage roles and permissions', 'settings', now()),
+        ('users:create', 'Create new user', 'users', now()),
+        ('users:delete', 'Delete user', 'users', now()),
+        ('users:list', 'List all users', 'users', now()),
+        ('users:manage_roles', 'Assign roles to users', 'users', now()),
+        ('users:read', 'View user details', 'users', now()),
+        ('users:update', 'Update user', 'users', now()),
+        ('users:view_activity', 'View user activity logs', 'users', now())
+    ON CONFLICT (name) DO NOTHING
+    RETURNING id, name
+),
+all_perms AS (
+    SELECT id, name FROM new_perms
+    UNION
+    SELECT id, name FROM public.permissions
+),
+new_roles AS (
+    INSERT INTO public.roles (name, description, level, is_system, created_at)
+    VALUES
+        ('super_admin', 'Super administrator with full system access', 40, TRUE, now()),
+        ('admin', 'Administrator with full access except system settings', 30, TRUE, now()),
+        ('editor', 'Editor who can manage all content', 20, TRUE, now()),
+        ('author', 'Author who can create and edit own content', 10, TRUE, now()),
+        ('user', 'Regular user with basic access', 0, TRUE, now())
+    ON CONFLICT (name) DO NOTHING
+    RETURNING id, name
+),
+all_roles AS (
+    SELECT id, name FROM new_roles
+    UNION
+    SELECT id, name FROM public.roles
+)
+INSERT INTO public.role_permissions (role_id, permission_id)
+SELECT r.id, p.id
+FROM (VALUES
+        ('admin', 'analytics:export'),
+        ('admin', 'analytics:view'),
+        ('admin', 'comments:approve'),
+        ('admin', 'comments:create'),
+        ('admin', 'comments:delete'),
+        ('admin', 'comments:moderate'),
+        ('admin', 'comments:read'),
+        ('admin', 'comments:update'),
+        ('admin', 'posts:bulk_update'),
+        ('admin', 'posts:create'),
+        ('admin', 'posts:delete'),
+        ('admin', 'posts:publish'),
+        ('admin', 'posts:read'),
+        ('admin', 'posts:schedule'),
+        ('admin', 'posts:update'),
+        ('admin', 'settings:manage_roles'),
+        ('admin', 'users:create'),
+        ('admin', 'users:delete'),
+        ('admin', 'users:list'),
+        ('admin', 'users:manage_roles'),
+        ('admin', 'users:read'),
+        ('admin', 'users:update'),
+        ('admin', 'users:view_activity'),
+        ('author', 'comments:create'),
+        ('author', 'comments:read'),
+        ('author', 'posts:create'),
+        ('author', 'posts:read'),
+        ('author', 'posts:update'),
+        ('editor', 'comments:approve'),
+        ('editor', 'comments:moderate'),
+        ('editor', 'comments:read'),
+        ('editor', 'posts:bulk_update'),
+        ('editor', 'posts:create'),
+        ('editor', 'posts:delete'),
+        ('editor', 'posts:publish'),
+        ('editor', 'posts:read'),
+        ('editor', 'posts:schedule'),
+        ('editor', 'posts:update'),
+        ('editor', 'users:read'),
+        ('super_admin', 'analytics:export'),
+        ('super_admin', 'analytics:view'),
+        ('super_admin', 'comments:approve'),
+        ('super_admin', 'comments:create'),
+        ('super_admin', 'comments:delete'),
+        ('super_admin', 'comments:moderate'),
+        ('super_admin', 'comments:read'),
+        ('super_admin', 'comments:update'),
+        ('super_admin', 'posts:bulk_update'),
+        ('super_admin', 'posts:create'),
+        ('super_admin', 'posts:delete'),
+        ('super_admin', 'posts:publish'),
+        ('super_admin', 'posts:read'),
+        ('super_admin', 'posts:schedule'),
+        ('super_admin', 'posts:update'),
+        ('super_admin', 'settings:manage'),
+        ('super_admin', 'settings:manage_roles'),
+        ('super_admin', 'users:create'),
+        ('super_admin', 'users:delete'),
+        ('super_admin', 'users:list'),
+        ('super_admin', 'users:manage_roles'),
+        ('super_admin', 'users:read'),
+        ('super_admin', 'users:update'),
+        ('super_admin', 'users:view_activity'),
+        ('user', 'comments:create'),
+        ('user', 'comments:read'),
+        ('user', 'posts:read')
+) AS m (role_name, perm_name)
+JOIN all_roles r ON r.name = m.role_name
+JOIN all_perms p ON p.name = m.perm_name
+ON CONFLICT DO NOTHING;
@@ -6,12 +6,18 @@ Version: 1.0.0
 """
 
 import logging
-from sqlalchemy.orm import Session
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, selectinload
 from user_management.config import SessionLocal
-from user_management.models import Role, Permission
+from user_management.models import Role, Permission, role_permissions
 
 logger = logging.getLogger(__name__)
 
+# Pregenerated single-statement seed (see generate_seed_sql.py)
+SEED_SQL_PATH = Path(__file__).with_name("seed.sql")
+
 
 # System Roles (predefined)
 SYSTEM_ROLES = [
@@ -87,115 +93,151 @@ PERMISSIONS = {
 }
 
 
+# All permission names, derived once from PERMISSIONS
+ALL_PERM_NAMES = frozenset(
+    perm_name
+    for perms in PERMISSIONS.values()
+    for perm_name, _ in perms
+)
+
+
 # Role to Permissions Mapping
+# Derived from PERMISSIONS where possible so new permissions don't need to
+# be hand-duplicated per role; frozensets make membership tests O(1)
 ROLE_PERMISSIONS = {
-    "super_admin": [
-        # All permissions
-        "users:list", "users:create", "users:read", "users:update", "users:delete",
-        "users:manage_roles", "users:view_activity",
-        "posts:create", "posts:read", "posts:update", "posts:delete", "posts:publish",
-        "posts:schedule", "posts:bulk_update",
-        "comments:create", "comments:read", "comments:update", "comments:delete",
-        "comments:moderate", "comments:approve",
-        "analytics:view", "analytics:export",
-        "settings:manage", "settings:manage_roles",
-    ],
-    "admin": [
-        # All except system settings
-        "users:list", "users:create", "users:read", "users:update", "users:delete",
-        "users:manage_roles", "users:view_activity",
-        "posts:create", "posts:read", "posts:update", "posts:delete", "posts:publish",
-        "posts:schedule", "posts:bulk_update",
-        "comments:create", "comments:read", "comments:update", "comments:delete",
-        "comments:moderate", "comments:approve",
-        "analytics:view", "analytics:export",
-        "settings:manage_roles",
-    ],
-    "editor": [
+    "super_admin": ALL_PERM_NAMES,
+    "admin": ALL_PERM_NAMES - {"settings:manage"},
+    "editor": frozenset({
         # Content management
         "posts:create", "posts:read", "posts:update", "posts:delete", "posts:publish",
         "posts:schedule", "posts:bulk_update",
         "comments:read", "comments:moderate", "comments:approve",
         "users:read",
-    ],
-    "author": [
+    }),
+    "author": frozenset({
         # Own content only
         "posts:create", "posts:read", "posts:update",
         "comments:create", "comments:read",
-    ],
-    "user": [
+    }),
+    "user": frozenset({
         # Basic access
         "posts:read",
         "comments:create", "comments:read",
-    ],
+    }),
 }
 
 
 def seed_roles_and_permissions():
     """
     Seed the database with initial roles and permissions for the plugin.
+
+    Uses bulk queries and inserts (one SELECT + one bulk INSERT per entity
+    type) instead of a round-trip per row, so the whole seed costs a handful
+    of statements regardless of how many permissions are defined.
     """
     db = SessionLocal()
-    
+
     try:
         logger.info("🌱 Seeding user_management plugin roles and permissions...")
-        
-        # Create permissions
-        permission_objects = {}
-        for module, perms in PERMISSIONS.items():
-            for perm_name, perm_desc in perms:
-                existing = db.query(Permission).filter(
-                    Permission.name == perm_name
-                ).first()
-                
-                if not existing:
-                    permission = Permission(
-                        name=perm_name,
-                        description=perm_desc,
-                        module=module,
-                    )
-                    db.add(permission)
-                    permission_objects[perm_name] = permission
-                    logger.debug(f"  ➕ Permission: {perm_name}")
-                else:
-                    permission_objects[perm_name] = existing
-        
-        db.commit()
+
+        # Fast path: the seed data is fully static, so the shipped seed.sql
+        # (regenerated offline from the constants above) does the whole
+        # seed in a single round-trip
+        if SEED_SQL_PATH.exists():
+            db.execute(text(SEED_SQL_PATH.read_text()))
+            db.commit()
+            logger.info("🌱 Seeded from pregenerated seed.sql (single statement)")
+            return True
+
+        # Create permissions: one SELECT for everything that exists,
+        # one bulk INSERT for everything that doesn't
+        permission_objects = {
+            p.name: p
+            for p in db.query(Permission).filter(
+                Permission.name.in_(ALL_PERM_NAMES)
+            ).all()
+        }
+
+        missing_permissions = [
+            {"name": perm_name, "description": perm_desc, "module": module}
+            for module, perms in PERMISSIONS.items()
+            for perm_name, perm_desc in perms
+            if perm_name not in permission_objects
+        ]
+        if missing_permissions:
+            # Single multi-row INSERT instead of one statement per row;
+            # ON CONFLICT makes the seed safe to run concurrently
+            db.execute(
+                pg_insert(Permission)
+                .values(missing_permissions)
+                .on_conflict_do_nothing(index_elements=["name"])
+            )
+
+        # Flush (not commit) so the new rows are visible to the re-fetch
+        # below; the whole seed commits once at the end
+        db.flush()
+
+        # Re-fetch so the mapping has persistent instances for all names
+        permission_objects = {
+            p.name: p
+            for p in db.query(Permission).filter(
+                Permission.name.in_(ALL_PERM_NAMES)
+            ).all()
+        }
         logger.info(f"✅ Created/verified {len(permission_objects)} permissions")
-        
-        # Create roles
-        role_objects = {}
+
+        # Create roles: same bulk pattern, permissions resolved from the
+        # in-memory mapping instead of one query per permission name
+        role_objects = {
+            r.name: r
+            for r in db.query(Role).filter(
+                Role.name.in_([rc["name"] for rc in SYSTEM_ROLES])
+            ).all()
+        }
+
         for role_config in SYSTEM_ROLES:
-            existing = db.query(Role).filter(
-                Role.name == role_config["name"]
-            ).first()
-            
-            if not existing:
-                role = Role(**role_config)
-                
-                # Assign permissions to role
-                if role_config["name"] in ROLE_PERMISSIONS:
-                    for perm_name in ROLE_PERMISSIONS[role_config["name"]]:
-                        perm = db.query(Permission).filter(
-                            Permission.name == perm_name
-                        ).first()
-                        if perm and perm not in role.permissions:
-                            role.permissions.append(perm)
-                
-                db.add(role)
-                role_objects[role_config["name"]] = role
-                logger.debug(f"  ➕ Role: {role_config['name']}")
-            else:
-                role_objects[role_config["name"]] = existing
+            if role_config["name"] in role_objects:
+                continue
+
+            role = Role(**role_config)
+            db.add(role)
+            role_objects[role_config["name"]] = role
+            logger.debug(f"  ➕ Role: {role_config['name']}")
+
+        # Flush so new roles have IDs, then attach permissions with one
+        # multi-row INSERT on the association table instead of letting the
+        # unit of work emit a statement per (role, permission) pair.
+        # Direct dict lookups: permission_objects covers ALL_PERM_NAMES,
+        # so an unknown name in ROLE_PERMISSIONS fails loudly here.
+        db.flush()
+
+        pairs = [
+            {
+                "role_id": role.id,
+                "permission_id": permission_objects[perm_name].id,
+            }
+            for role_name, role in role_objects.items()
+            for perm_name in ROLE_PERMISSIONS.get(role_name, ())
+        ]
+        if pairs:
+            db.execute(
+                pg_insert(role_permissions)
+                .values(pairs)
+                .on_conflict_do_nothing()
+            )
         
         db.commit()
         logger.info(f"✅ Created/verified {len(role_objects)} system roles")
         
         logger.info("🌱 User management seeding completed successfully!")
         logger.info("\n📋 System Roles:")
-        for role_name in role_objects:
-            role = role_objects[role_name]
-            logger.info(f"   - {role_name} (level {role.level}): {len(role.permissions)} permissions")
+        # Eager-load permissions in one batch so the summary loop below
+        # doesn't trigger a lazy SELECT per role
+        seeded_roles = db.query(Role).filter(
+            Role.name.in_(role_objects)
+        ).options(selectinload(Role.permissions)).all()
+        for role in seeded_roles:
+            logger.info(f"   - {role.name} (level {role.level}): {len(role.permissions)} permissions")
         
         return True
         
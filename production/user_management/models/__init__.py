@@ -10,8 +10,9 @@ from .user import (
     UserSession,
     UserActivityLog,
     UserPreferences,
-    EmailVerificationToken,
-    PasswordResetToken,
+    AuthToken,
+    TOKEN_KIND_EMAIL_VERIFICATION,
+    TOKEN_KIND_PASSWORD_RESET,
     UserRole,
     user_roles,
     role_permissions,
@@ -24,8 +25,9 @@ __all__ = [
     "UserSession",
     "UserActivityLog",
     "UserPreferences",
-    "EmailVerificationToken",
-    "PasswordResetToken",
+    "AuthToken",
+    "TOKEN_KIND_EMAIL_VERIFICATION",
+    "TOKEN_KIND_PASSWORD_RESET",
     "UserRole",
     "user_roles",
     "role_permissions",
@@ -5,16 +5,31 @@ Author: GabForge
 Version: 2.0.0 (Phase 2.1 - User Management Plugin)
 """
 
+from datetime import datetime, timezone
 from enum import Enum
+from functools import cached_property
+from sys import intern
+from typing import List, Optional
 from sqlalchemy import (
-    Column, Integer, String, Boolean, DateTime, 
-    Enum as SQLEnum, ForeignKey, Table, Text, JSON
+    Column, Integer, SmallInteger, String, Boolean, CheckConstraint, DateTime,
+    ForeignKey, Index, Table, Text, event, text
 )
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 from user_management.config import Base
 
 
+def utcnow() -> datetime:
+    """
+    Naive UTC timestamp for column defaults, computed client-side.
+
+    A Python-side default keeps the value known before flush, so bulk
+    inserts can use SQLAlchemy's insertmanyvalues fast path instead of
+    needing RETURNING to hydrate server-generated timestamps.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 # ============================================================================
 # ENUMS
 # ============================================================================
@@ -37,7 +52,7 @@ user_roles = Table(
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
     Column('role_id', Integer, ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True),
-    Column('assigned_at', DateTime, default=func.now()),
+    Column('assigned_at', DateTime, default=utcnow),
     Column('assigned_by', Integer, ForeignKey('users.id', ondelete='SET NULL'), nullable=True),
     Column('expires_at', DateTime, nullable=True),
 )
@@ -57,59 +72,106 @@ role_permissions = Table(
 class User(Base):
     """
     User database model with extended fields for Phase 2.1.
-    
-    Represents a user account with authentication, profile, 
+
+    Represents a user account with authentication, profile,
     roles, and activity tracking.
     """
     __tablename__ = "users"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # Partial indexes matching the real query shapes: auth looks up
+        # active non-deleted users by email, listings exclude soft-deleted
+        Index(
+            'ix_users_email_active', 'email',
+            postgresql_where=text('deleted_at IS NULL AND is_active = true'),
+        ),
+        Index(
+            'ix_users_username_active', 'username',
+            postgresql_where=text('deleted_at IS NULL'),
+        ),
+        # Functional index so case-insensitive login stays an index probe
+        Index('ix_users_email_lower', text('lower(email)'), unique=True),
+        CheckConstraint(
+            "role IN ('super_admin', 'admin', 'moderator', 'user', 'guest')",
+            name='ck_users_role',
+        ),
+        {"schema": "public"},
+    )
 
     # Primary key
-    id = Column(Integer, primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
     # Authentication
-    username = Column(String(100), unique=True, index=True, nullable=False)
-    email = Column(String(255), unique=True, index=True, nullable=False)
-    password_hash = Column(String(255), nullable=False)
+    username: Mapped[str] = mapped_column(String(100), unique=True, index=True)
+    email: Mapped[str] = mapped_column(String(255), unique=True, index=True)
+    password_hash: Mapped[str] = mapped_column(String(255))
 
     # Profile
-    first_name = Column(String(100), nullable=True)
-    last_name = Column(String(100), nullable=True)
-    avatar_url = Column(String(500), nullable=True)
-    bio = Column(Text, nullable=True)
-    phone = Column(String(20), nullable=True)
+    first_name: Mapped[Optional[str]] = mapped_column(String(100))
+    last_name: Mapped[Optional[str]] = mapped_column(String(100))
+    avatar_url: Mapped[Optional[str]] = mapped_column(String(500))
+    bio: Mapped[Optional[str]] = mapped_column(Text)
+    phone: Mapped[Optional[str]] = mapped_column(String(20))
 
     # Status
-    is_active = Column(Boolean, default=True, index=True)
-    is_email_verified = Column(Boolean, default=False)
-    email_verified_at = Column(DateTime, nullable=True)
+    # No standalone index on is_active: too low-cardinality for the planner
+    # to pick; the partial indexes above cover the active-user filters
+    is_active: Mapped[Optional[bool]] = mapped_column(Boolean, default=True)
+    is_email_verified: Mapped[Optional[bool]] = mapped_column(Boolean, default=False)
+    email_verified_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
 
     # Tracking
-    last_login = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, default=func.now(), nullable=False)
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
-    deleted_at = Column(DateTime, nullable=True)  # Soft delete
+    last_login: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, onupdate=utcnow)
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime)  # Soft delete
 
     # Relationships
-    roles = relationship("Role", secondary=user_roles, back_populates="users")
-    activity_logs = relationship("UserActivityLog", back_populates="user", cascade="all, delete-orphan")
-    sessions = relationship("UserSession", back_populates="user", cascade="all, delete-orphan")
-    preferences = relationship("UserPreferences", back_populates="user", uselist=False, cascade="all, delete-orphan")
-
-    # Legacy field (kept for backward compatibility)
-    role = Column(SQLEnum(UserRole), default=UserRole.USER, index=True, nullable=True)
+    # selectin loading batches the role/permission fetch into one IN query
+    # instead of a lazy SELECT per access (N+1 on every permission check)
+    roles: Mapped[List["Role"]] = relationship(
+        "Role", secondary=user_roles, back_populates="users", lazy="selectin"
+    )
+    # Child cleanup is handled by ON DELETE CASCADE on the FKs;
+    # passive_deletes keeps the ORM from loading and deleting children
+    # row by row when a user is deleted
+    activity_logs: Mapped[List["UserActivityLog"]] = relationship(
+        "UserActivityLog", back_populates="user", passive_deletes=True
+    )
+    sessions: Mapped[List["UserSession"]] = relationship(
+        "UserSession", back_populates="user", passive_deletes=True
+    )
+    preferences: Mapped[Optional["UserPreferences"]] = relationship(
+        "UserPreferences", back_populates="user", uselist=False, passive_deletes=True
+    )
+
+    # Legacy field (kept for backward compatibility). Plain VARCHAR with a
+    # CHECK constraint instead of a native Postgres enum: no pg_type
+    # metadata to create/alter, same validation. UserRole stays the
+    # Python-side vocabulary at service boundaries.
+    role: Mapped[Optional[str]] = mapped_column(String(20), default=UserRole.USER.value, index=True)
+
+    @cached_property
+    def permission_set(self) -> frozenset:
+        """
+        Permission names from all assigned roles, cached per instance.
+
+        Names are interned: the small fixed vocabulary of permission
+        strings then shares storage across users, and membership checks
+        short-circuit on pointer identity instead of re-hashing the bytes.
+        """
+        return frozenset(
+            intern(permission.name)
+            for role in self.roles
+            for permission in role.permissions
+        )
 
     def get_permissions(self):
         """Get all permissions from assigned roles"""
-        permissions = set()
-        for role in self.roles:
-            for permission in role.permissions:
-                permissions.add(permission.name)
-        return permissions
+        return set(self.permission_set)
 
     def has_permission(self, permission_name: str) -> bool:
         """Check if user has specific permission"""
-        return permission_name in self.get_permissions()
+        return intern(permission_name) in self.permission_set
 
     def has_role(self, role_name: str) -> bool:
         """Check if user has specific role"""
@@ -119,34 +181,51 @@ class User(Base):
         """Check if user is admin"""
         return self.has_role('admin') or self.has_role('super_admin')
 
-    @property
+    @cached_property
     def full_name(self) -> str:
-        """Get full name"""
-        if self.first_name and self.last_name:
-            return f"{self.first_name} {self.last_name}"
-        return self.first_name or self.username
+        """Get full name (cached; serialization reads it repeatedly)"""
+        first_name, last_name = self.first_name, self.last_name
+        if first_name and last_name:
+            return first_name + " " + last_name
+        return first_name or self.username
+
+
+@event.listens_for(User.roles, 'append')
+@event.listens_for(User.roles, 'remove')
+def _invalidate_permission_cache(user, role, initiator):
+    """Drop the cached permission set when role assignments change"""
+    user.__dict__.pop('permission_set', None)
 
 
 class Role(Base):
     """
     Role definition for RBAC system.
-    
+
     System roles: admin (30), editor (20), author (10), user (0)
     Can also create custom roles.
     """
     __tablename__ = "roles"
     __table_args__ = {"schema": "public"}
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String(50), unique=True, index=True, nullable=False)
-    description = Column(Text, nullable=True)
-    level = Column(Integer, default=0)  # Hierarchy level: 0=user, 10=author, 20=editor, 30=admin
-    is_system = Column(Boolean, default=False)  # Cannot delete system roles
-    created_at = Column(DateTime, default=func.now(), nullable=False)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    name: Mapped[str] = mapped_column(String(50), unique=True, index=True)
+    description: Mapped[Optional[str]] = mapped_column(Text)
+    level: Mapped[Optional[int]] = mapped_column(Integer, default=0)  # Hierarchy level: 0=user, 10=author, 20=editor, 30=admin
+    is_system: Mapped[Optional[bool]] = mapped_column(Boolean, default=False)  # Cannot delete system roles
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
+
+    # Materialized permission names, kept in sync by a DB trigger on
+    # role_permissions (installed in run_migrations). Read paths can take
+    # the names straight from this column without joining two tables.
+    permissions_cache: Mapped[Optional[list]] = mapped_column(ARRAY(String), server_default=text("'{}'"))
 
     # Relationships
-    users = relationship("User", secondary=user_roles, back_populates="roles")
-    permissions = relationship("Permission", secondary=role_permissions, back_populates="roles")
+    users: Mapped[List["User"]] = relationship(
+        "User", secondary=user_roles, back_populates="roles"
+    )
+    permissions: Mapped[List["Permission"]] = relationship(
+        "Permission", secondary=role_permissions, back_populates="roles", lazy="selectin"
+    )
 
     def __repr__(self):
         return f"<Role {self.name}>"
@@ -155,20 +234,22 @@ class Role(Base):
 class Permission(Base):
     """
     Permission definition for fine-grained access control.
-    
+
     Format: "module:action" (e.g., "posts:create", "comments:delete")
     """
     __tablename__ = "permissions"
     __table_args__ = {"schema": "public"}
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String(100), unique=True, index=True, nullable=False)
-    description = Column(Text, nullable=True)
-    module = Column(String(50), index=True, nullable=False)  # posts, comments, users, etc.
-    created_at = Column(DateTime, default=func.now(), nullable=False)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, index=True)
+    description: Mapped[Optional[str]] = mapped_column(Text)
+    module: Mapped[str] = mapped_column(String(50), index=True)  # posts, comments, users, etc.
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
 
     # Relationships
-    roles = relationship("Role", secondary=role_permissions, back_populates="permissions")
+    roles: Mapped[List["Role"]] = relationship(
+        "Role", secondary=role_permissions, back_populates="permissions"
+    )
 
     def __repr__(self):
         return f"<Permission {self.name}>"
@@ -181,17 +262,17 @@ class UserSession(Base):
     __tablename__ = "user_sessions"
     __table_args__ = {"schema": "public"}
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True, nullable=False)
-    token = Column(String(255), unique=True, index=True, nullable=False)
-    ip_address = Column(String(45), nullable=True)
-    user_agent = Column(Text, nullable=True)
-    last_activity = Column(DateTime, default=func.now(), onupdate=func.now())
-    expires_at = Column(DateTime, nullable=False)
-    created_at = Column(DateTime, default=func.now(), nullable=False)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), index=True)
+    token: Mapped[str] = mapped_column(String(255), unique=True, index=True)
+    ip_address: Mapped[Optional[str]] = mapped_column(String(45))
+    user_agent: Mapped[Optional[str]] = mapped_column(Text)
+    last_activity: Mapped[Optional[datetime]] = mapped_column(DateTime, default=utcnow, onupdate=utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
 
     # Relationships
-    user = relationship("User", back_populates="sessions")
+    user: Mapped["User"] = relationship("User", back_populates="sessions")
 
 
 class UserActivityLog(Base):
@@ -199,20 +280,35 @@ class UserActivityLog(Base):
     Audit trail for user actions and security events.
     """
     __tablename__ = "user_activity_logs"
-    __table_args__ = {"schema": "public"}
-
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True, nullable=False)
-    action = Column(String(100), index=True, nullable=False)  # login, logout, post_created, etc.
-    entity_type = Column(String(50), nullable=True)  # post, comment, user, etc.
-    entity_id = Column(Integer, nullable=True)
-    ip_address = Column(String(45), nullable=True)
-    user_agent = Column(Text, nullable=True)
-    meta_data = Column(JSON, nullable=True)  # Additional data
-    created_at = Column(DateTime, default=func.now(), index=True, nullable=False)
+    __table_args__ = (
+        # "Recent activity for user" scans walk this composite directly
+        # instead of an index scan on user_id followed by a sort
+        Index('ix_activity_user_created', 'user_id', 'created_at'),
+        # GIN index makes meta_data key lookups index-driven
+        Index('ix_activity_meta_gin', 'meta_data', postgresql_using='gin'),
+        # Inserts are append-only in time order, so a BRIN summary (a few
+        # KB total) serves created_at range scans in place of a btree that
+        # would grow with the table
+        Index(
+            'brin_activity_created_at', 'created_at',
+            postgresql_using='brin',
+            postgresql_with={'pages_per_range': 32},
+        ),
+        {"schema": "public"},
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), index=True)
+    action: Mapped[str] = mapped_column(String(100), index=True)  # login, logout, post_created, etc.
+    entity_type: Mapped[Optional[str]] = mapped_column(String(50))  # post, comment, user, etc.
+    entity_id: Mapped[Optional[int]] = mapped_column(Integer)
+    ip_address: Mapped[Optional[str]] = mapped_column(String(45))
+    user_agent: Mapped[Optional[str]] = mapped_column(Text)
+    meta_data: Mapped[Optional[dict]] = mapped_column(JSONB)  # Additional data, binary-decomposed on disk
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)  # BRIN-indexed above
 
     # Relationships
-    user = relationship("User", back_populates="activity_logs")
+    user: Mapped["User"] = relationship("User", back_populates="activity_logs")
 
     def __repr__(self):
         return f"<ActivityLog user_id={self.user_id} action={self.action}>"
@@ -225,44 +321,44 @@ class UserPreferences(Base):
     __tablename__ = "user_preferences"
     __table_args__ = {"schema": "public"}
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), unique=True, index=True, nullable=False)
-    theme = Column(String(20), default='light')  # light, dark
-    language = Column(String(10), default='en')
-    timezone = Column(String(50), default='UTC')
-    email_notifications = Column(Boolean, default=True)
-    digest_frequency = Column(String(20), default='daily')  # daily, weekly, monthly
-    two_factor_enabled = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=func.now(), nullable=False)
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), unique=True, index=True)
+    theme: Mapped[Optional[str]] = mapped_column(String(20), default='light')  # light, dark
+    language: Mapped[Optional[str]] = mapped_column(String(10), default='en')
+    timezone: Mapped[Optional[str]] = mapped_column(String(50), default='UTC')
+    email_notifications: Mapped[Optional[bool]] = mapped_column(Boolean, default=True)
+    digest_frequency: Mapped[Optional[str]] = mapped_column(String(20), default='daily')  # daily, weekly, monthly
+    two_factor_enabled: Mapped[Optional[bool]] = mapped_column(Boolean, default=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, onupdate=utcnow)
 
     # Relationships
-    user = relationship("User", back_populates="preferences")
+    user: Mapped["User"] = relationship("User", back_populates="preferences")
 
 
-class EmailVerificationToken(Base):
-    """
-    Email verification tokens for user registration.
-    """
-    __tablename__ = "email_verification_tokens"
-    __table_args__ = {"schema": "public"}
-
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True, nullable=False)
-    token = Column(String(255), unique=True, index=True, nullable=False)
-    expires_at = Column(DateTime, nullable=False)
-    created_at = Column(DateTime, default=func.now(), nullable=False)
+# AuthToken.kind discriminator values
+TOKEN_KIND_EMAIL_VERIFICATION = 1
+TOKEN_KIND_PASSWORD_RESET = 2
 
 
-class PasswordResetToken(Base):
-    """
-    Password reset tokens for account recovery.
+class AuthToken(Base):
     """
-    __tablename__ = "password_reset_tokens"
-    __table_args__ = {"schema": "public"}
+    Short-lived auth tokens (email verification, password reset).
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True, nullable=False)
-    token = Column(String(255), unique=True, index=True, nullable=False)
-    expires_at = Column(DateTime, nullable=False)
-    created_at = Column(DateTime, default=func.now(), nullable=False)
+    The two flows were schema-identical, so they share one append-only
+    table discriminated by `kind` — one hot unique index on token serves
+    both, and expiry sweeps walk a single (user_id, kind, expires_at)
+    index instead of two tables.
+    """
+    __tablename__ = "auth_tokens"
+    __table_args__ = (
+        Index('ix_auth_tokens_user_kind_exp', 'user_id', 'kind', 'expires_at'),
+        {"schema": "public"},
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    kind: Mapped[int] = mapped_column(SmallInteger)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), index=True)
+    token: Mapped[str] = mapped_column(String(255), unique=True, index=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
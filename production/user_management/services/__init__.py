@@ -4,5 +4,6 @@ services/__init__.py - User Management Plugin Services
 
 from .auth import AuthService
 from .rbac import RBACService
+from .activity import ActivityBuffer, activity_buffer
 
-__all__ = ["AuthService", "RBACService"]
+__all__ = ["AuthService", "RBACService", "ActivityBuffer", "activity_buffer"]
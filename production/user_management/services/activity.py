@@ -0,0 +1,173 @@
+"""
+activity.py - Write-behind activity logging for user_management plugin
+Purpose: Buffer activity log writes and session touches, flush in batches
+Author: GabForge
+Version: 1.0.0
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from user_management.config import SessionLocal, settings
+from user_management.models import UserActivityLog, UserSession
+
+logger = logging.getLogger(__name__)
+
+# Redis is optional; the buffer degrades to in-process storage without it
+try:
+    import redis as _redis
+except ImportError:
+    _redis = None
+
+_ACTIVITY_KEY = "user_management:activity_buffer"
+_SESSION_TOUCH_PREFIX = "user_management:session_touch:"
+
+# Seconds between background drains of the activity buffer
+FLUSH_INTERVAL = 0.5
+
+# Minimum seconds between last_activity writes for the same session
+SESSION_TOUCH_INTERVAL = 60
+
+
+class ActivityBuffer:
+    """
+    Write-behind buffer for UserActivityLog rows and session touches.
+
+    record() is O(1) and never touches the database; the background drain
+    (started from app startup via run()) bulk-inserts everything
+    accumulated since the previous pass, turning N log writes per second
+    into one batched insert per flush interval. Session last_activity
+    updates are throttled to one write per session per minute instead of
+    one per authenticated request.
+    """
+
+    def __init__(self):
+        self._local = deque()
+        self._touches = {}
+        self._redis = None
+        if settings.USE_REDIS and _redis is not None:
+            try:
+                self._redis = _redis.Redis.from_url(settings.REDIS_URL)
+            except Exception as e:
+                logger.warning(f"⚠️  Redis unavailable, using in-process buffer: {e}")
+
+    def record(self, user_id: int, action: str, entity_type: str = None,
+               entity_id: int = None, ip_address: str = None,
+               user_agent: str = None, meta_data: dict = None):
+        """Queue one activity log entry (no database access)"""
+        entry = {
+            "user_id": user_id,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "meta_data": meta_data,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        if self._redis is not None:
+            self._redis.lpush(_ACTIVITY_KEY, json.dumps(entry))
+        else:
+            self._local.append(entry)
+
+    def touch_session(self, db: Session, token: str) -> bool:
+        """
+        Update UserSession.last_activity, at most once per
+        SESSION_TOUCH_INTERVAL per session. Returns True if written.
+        """
+        now = time.time()
+        if self._redis is not None:
+            marker = self._redis.set(
+                _SESSION_TOUCH_PREFIX + token, now,
+                nx=True, ex=SESSION_TOUCH_INTERVAL,
+            )
+            if not marker:
+                return False
+        else:
+            last = self._touches.get(token, 0)
+            if now - last < SESSION_TOUCH_INTERVAL:
+                return False
+            self._touches[token] = now
+
+        db.execute(
+            update(UserSession)
+            .where(UserSession.token == token)
+            .values(last_activity=datetime.utcnow())
+        )
+        db.commit()
+        return True
+
+    def _drain(self):
+        """Take everything currently buffered, leaving newer entries queued"""
+        if self._redis is not None:
+            pipe = self._redis.pipeline()
+            pipe.lrange(_ACTIVITY_KEY, 0, -1)
+            pipe.delete(_ACTIVITY_KEY)
+            raw, _ = pipe.execute()
+            return [json.loads(e) for e in reversed(raw)]
+
+        entries = []
+        while self._local:
+            entries.append(self._local.popleft())
+        return entries
+
+    def _requeue(self, entries):
+        """Return a failed batch to the buffer, preserving order"""
+        for entry in entries:
+            created = entry["created_at"]
+            if isinstance(created, datetime):
+                entry["created_at"] = created.isoformat()
+        if self._redis is not None:
+            pipe = self._redis.pipeline()
+            for entry in reversed(entries):
+                pipe.rpush(_ACTIVITY_KEY, json.dumps(entry))
+            pipe.execute()
+        else:
+            self._local.extendleft(reversed(entries))
+
+    def flush(self, db: Session = None) -> int:
+        """Bulk-insert all buffered entries; returns the count flushed"""
+        entries = self._drain()
+        if not entries:
+            return 0
+
+        for entry in entries:
+            entry["created_at"] = datetime.fromisoformat(entry["created_at"])
+
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(UserActivityLog, entries)
+            db.commit()
+            return len(entries)
+        except Exception:
+            db.rollback()
+            # Put the batch back rather than dropping audit rows on a
+            # transient failure; the next drain retries it
+            self._requeue(entries)
+            raise
+        finally:
+            if own_session:
+                db.close()
+
+    async def run(self):
+        """Background drain loop; start with asyncio.create_task at startup"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except Exception as e:
+                logger.error(f"❌ Activity flush failed: {e}")
+
+
+# Shared buffer instance used by routes and services
+activity_buffer = ActivityBuffer()
@@ -5,44 +5,200 @@ Author: GabForge
 Version: 1.0.0
 """
 
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
 import logging
-import jwt
+import os
+import time
+import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from functools import lru_cache
+from sqlalchemy import func
+from sqlalchemy.orm import Session, raiseload, selectinload
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthCredentials
 
-from user_management.models import User, UserSession, EmailVerificationToken, PasswordResetToken
+from user_management.models import User, Role, UserSession, AuthToken
 from user_management.config import get_db, settings
+from user_management.services.activity import activity_buffer
 
 logger = logging.getLogger(__name__)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Worker pool for bcrypt: hashing takes ~100ms of CPU and would otherwise
+# block the event loop for the duration; bcrypt's C code releases the GIL,
+# so concurrent logins actually spread across cores
+_HASH_POOL = ThreadPoolExecutor(max_workers=os.cpu_count())
 
 # Security scheme for Bearer token
 security = HTTPBearer()
 
+# Hashed once at import and verified against whenever login hits an unknown
+# email, so the not-found path burns the same bcrypt work as a real check.
+# Without it, response timing tells attackers which emails exist.
+_DUMMY_HASH = bcrypt.hashpw(b"dummy-password", bcrypt.gensalt(settings.BCRYPT_COST)).decode()
+
+
+class TokenError(Exception):
+    """Invalid or malformed token"""
+
+
+class TokenExpiredError(TokenError):
+    """Token past its exp claim"""
+
+
+def _b64url_encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64url_decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+class _HS256Codec:
+    """
+    Minimal HS256 JWT encoder/decoder.
+
+    PyJWT spends most of an encode/decode in Python-level header
+    assembly, algorithm registry lookups, and option handling around a
+    tiny C HMAC call. This codec precomputes the header segment and the
+    keyed HMAC state once, reusing the latter via .copy() per call, so
+    each token costs two base64 passes and one HMAC update.
+    """
+
+    def __init__(self, key: str):
+        self._header = _b64url_encode(
+            json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode()
+        )
+        self._hmac = hmac.new(key.encode(), digestmod=hashlib.sha256)
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._hmac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, payload: dict) -> str:
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        signing_input = self._header + b"." + _b64url_encode(body)
+        return (signing_input + b"." + _b64url_encode(self._sign(signing_input))).decode()
+
+    def decode(self, token: str) -> dict:
+        """Verify signature and expiry, returning the payload claims"""
+        try:
+            raw = token.encode()
+            signing_input, _, signature = raw.rpartition(b".")
+            header_b64, _, payload_b64 = signing_input.partition(b".")
+            if not header_b64 or not payload_b64 or not signature:
+                raise TokenError("Malformed token")
+            if not hmac.compare_digest(_b64url_decode(signature), self._sign(signing_input)):
+                raise TokenError("Signature mismatch")
+            payload = json.loads(_b64url_decode(payload_b64))
+        except TokenError:
+            raise
+        except (ValueError, TypeError) as e:
+            raise TokenError(f"Malformed token: {e}")
+
+        exp = payload.get("exp")
+        if exp is not None and exp <= time.time():
+            raise TokenExpiredError("Token expired")
+
+        return payload
+
+
+# JWT secret is fixed for the process lifetime; build the codec once.
+# HS256 only - matches the JWT_ALGORITHM default and keeps the hot path free
+# of per-call algorithm dispatch.
+_jwt_codec = _HS256Codec(settings.JWT_SECRET_KEY)
+
+# Default token lifetimes in seconds, computed once: settings attribute
+# access goes through Pydantic and this sits on every token issuance
+_ACCESS_TOKEN_LIFETIME = settings.JWT_EXPIRATION_HOURS * 3600
+_REFRESH_TOKEN_LIFETIME = settings.JWT_REFRESH_EXPIRATION_DAYS * 86400
+
+# Access tokens revoked before their natural expiry (logout); consulted on
+# every verification so the decode cache can't resurrect them
+_TOKEN_BLACKLIST = set()
+
+# Short-lived cache of auth lookups: user_id -> (expires_at, User).
+# Entries are detached instances with roles/permissions already loaded, so
+# request handling skips the per-request SELECT while an entry is fresh.
+# Must be invalidated whenever the account or its roles are mutated.
+_USER_CACHE = {}
+_USER_CACHE_TTL = 60  # seconds
+_USER_CACHE_MAX = 10_000
+
+
+def invalidate_user_cache(user_id: int):
+    """Drop a user's cached auth lookup (call after mutating the account)"""
+    _USER_CACHE.pop(user_id, None)
+
+
+@lru_cache(maxsize=4096)
+def _decode_access_token(token: str):
+    """
+    Decode and signature-check an access token, memoized per token.
+
+    The same token is typically presented hundreds of times over its
+    lifetime; caching turns the repeat HMAC work into a dict lookup.
+    Failures raise and are never cached, and the returned expiry is
+    re-checked against the clock on every use.
+    """
+    payload = _jwt_codec.decode(token)
+
+    if payload.get("type") != "access":
+        raise TokenError("Invalid token type")
+
+    return int(payload.get("sub")), payload.get("exp")
+
 
 class AuthService:
     """Authentication service for user_management plugin"""
     
     @staticmethod
     def hash_password(password: str) -> str:
-        """Hash password using bcrypt"""
-        return pwd_context.hash(password)
-    
+        """Hash password using bcrypt (truncated to its 72-byte limit)"""
+        return bcrypt.hashpw(
+            password.encode('utf-8')[:72],
+            bcrypt.gensalt(settings.BCRYPT_COST)
+        ).decode()
+
     @staticmethod
     def verify_password(password: str, hashed: str) -> bool:
         """Verify password against hash"""
-        return pwd_context.verify(password, hashed)
-    
+        try:
+            return bcrypt.checkpw(password.encode('utf-8')[:72], hashed.encode())
+        except ValueError:
+            # Malformed stored hash
+            return False
+
     @staticmethod
-    def create_user(db: Session, email: str, username: str, password: str, 
+    def _hash_cost(hashed: str) -> int:
+        """Extract the cost factor from a stored bcrypt hash"""
+        try:
+            return int(hashed.split('$')[2])
+        except (IndexError, ValueError):
+            return -1
+
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """Hash password on the worker pool, keeping the event loop free"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_HASH_POOL, AuthService.hash_password, password)
+
+    @staticmethod
+    async def verify_password_async(password: str, hashed: str) -> bool:
+        """Verify password on the worker pool, keeping the event loop free"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_HASH_POOL, AuthService.verify_password, password, hashed)
+
+    @staticmethod
+    async def create_user(db: Session, email: str, username: str, password: str,
                    first_name: str = None, last_name: str = None) -> User:
         """Create new user"""
-        hashed_password = AuthService.hash_password(password)
+        hashed_password = await AuthService.hash_password_async(password)
         
         user = User(
             email=email,
@@ -60,130 +216,159 @@ class AuthService:
         return user
     
     @staticmethod
-    def authenticate_user(db: Session, email: str, password: str) -> User:
-        """Authenticate user by email and password"""
-        user = db.query(User).filter(User.email == email).first()
-        
+    async def authenticate_user(db: Session, email: str, password: str) -> User:
+        """Authenticate user by email and password (email is case-insensitive)"""
+        user = db.query(User).filter(func.lower(User.email) == email.lower()).first()
+
         if not user:
+            # Burn a bcrypt verification anyway so this path takes as long
+            # as a wrong-password rejection (no user-enumeration timing oracle)
+            await AuthService.verify_password_async(password, _DUMMY_HASH)
             logger.warning(f"❌ User not found: {email}")
             return None
-        
-        if not AuthService.verify_password(password, user.password_hash):
+
+        if not await AuthService.verify_password_async(password, user.password_hash):
             logger.warning(f"❌ Invalid password: {email}")
             return None
         
         if not user.is_active:
             logger.warning(f"❌ User inactive: {email}")
             return None
-        
-        # Update last login
-        user.last_login = datetime.utcnow()
-        db.commit()
+
+        # Upgrade path: if BCRYPT_COST changed since this hash was stored,
+        # rehash now while the plaintext is in hand
+        dirty = False
+        if AuthService._hash_cost(user.password_hash) != settings.BCRYPT_COST:
+            user.password_hash = await AuthService.hash_password_async(password)
+            logger.info(f"🔁 Password hash upgraded to cost {settings.BCRYPT_COST}: {email}")
+            dirty = True
+
+        # Update last login - telemetry only, so throttle to one write per
+        # five minutes per user instead of an UPDATE + fsync on every login
+        now = datetime.utcnow()
+        if user.last_login is None or now - user.last_login > timedelta(minutes=5):
+            user.last_login = now
+            dirty = True
+
+        if dirty:
+            db.commit()
         
         logger.info(f"✅ User authenticated: {email}")
         return user
     
     @staticmethod
-    def change_password(db: Session, user: User, old_password: str, new_password: str) -> bool:
+    async def change_password(db: Session, user: User, old_password: str, new_password: str) -> bool:
         """Change user password"""
-        if not AuthService.verify_password(old_password, user.password_hash):
+        if not await AuthService.verify_password_async(old_password, user.password_hash):
             logger.warning(f"❌ Invalid old password: {user.email}")
             return False
-        
-        user.password_hash = AuthService.hash_password(new_password)
+
+        user.password_hash = await AuthService.hash_password_async(new_password)
         db.commit()
-        
+        invalidate_user_cache(user.id)
+
         logger.info(f"✅ Password changed: {user.email}")
         return True
     
     @staticmethod
     def create_access_token(user_id: int, expires_in_hours: int = None) -> str:
         """Create JWT access token"""
-        if expires_in_hours is None:
-            expires_in_hours = settings.JWT_EXPIRATION_HOURS
-        
+        lifetime = _ACCESS_TOKEN_LIFETIME if expires_in_hours is None else expires_in_hours * 3600
+
+        now = int(time.time())
         payload = {
             "sub": str(user_id),
             "type": "access",
-            "exp": datetime.utcnow() + timedelta(hours=expires_in_hours),
-            "iat": datetime.utcnow()
+            "exp": now + lifetime,
+            "iat": now
         }
-        
-        token = jwt.encode(
-            payload,
-            settings.JWT_SECRET_KEY,
-            algorithm=settings.JWT_ALGORITHM
-        )
-        
-        return token
+
+        return _jwt_codec.encode(payload)
     
     @staticmethod
     def create_refresh_token(user_id: int, expires_in_days: int = None) -> str:
         """Create JWT refresh token"""
-        if expires_in_days is None:
-            expires_in_days = settings.JWT_REFRESH_EXPIRATION_DAYS
-        
+        lifetime = _REFRESH_TOKEN_LIFETIME if expires_in_days is None else expires_in_days * 86400
+
+        now = int(time.time())
         payload = {
             "sub": str(user_id),
             "type": "refresh",
-            "exp": datetime.utcnow() + timedelta(days=expires_in_days),
-            "iat": datetime.utcnow()
+            "exp": now + lifetime,
+            "iat": now
         }
-        
-        token = jwt.encode(
-            payload,
-            settings.JWT_SECRET_KEY,
-            algorithm=settings.JWT_ALGORITHM
-        )
-        
-        return token
+
+        return _jwt_codec.encode(payload)
     
     @staticmethod
     def verify_access_token(token: str) -> int:
         """Verify JWT access token and return user_id"""
+        if token in _TOKEN_BLACKLIST:
+            logger.warning("❌ Token revoked")
+            return None
+
         try:
-            payload = jwt.decode(
-                token,
-                settings.JWT_SECRET_KEY,
-                algorithms=[settings.JWT_ALGORITHM]
-            )
-            
-            if payload.get("type") != "access":
-                logger.warning("❌ Invalid token type")
-                return None
-            
-            user_id = int(payload.get("sub"))
-            return user_id
-        except jwt.ExpiredSignatureError:
+            user_id, exp = _decode_access_token(token)
+        except TokenExpiredError:
             logger.warning("❌ Token expired")
             return None
-        except jwt.InvalidTokenError:
+        except TokenError:
             logger.warning("❌ Invalid token")
             return None
+
+        # Cached entries outlive the signature check; expiry is enforced here
+        if exp is not None and exp <= time.time():
+            logger.warning("❌ Token expired")
+            return None
+
+        return user_id
+
+    @staticmethod
+    def revoke_access_token(token: str):
+        """Blacklist a token so cached verification stops accepting it"""
+        _TOKEN_BLACKLIST.add(token)
     
     @staticmethod
     def verify_refresh_token(token: str) -> int:
         """Verify JWT refresh token and return user_id"""
         try:
-            payload = jwt.decode(
-                token,
-                settings.JWT_SECRET_KEY,
-                algorithms=[settings.JWT_ALGORITHM]
-            )
-            
+            payload = _jwt_codec.decode(token)
+
             if payload.get("type") != "refresh":
                 logger.warning("❌ Invalid token type")
                 return None
-            
+
             user_id = int(payload.get("sub"))
             return user_id
-        except jwt.ExpiredSignatureError:
+        except TokenExpiredError:
             logger.warning("❌ Refresh token expired")
             return None
-        except jwt.InvalidTokenError:
+        except TokenError:
             logger.warning("❌ Invalid refresh token")
             return None
     
+    @staticmethod
+    def load_user_for_auth(db: Session, user_id: int) -> User:
+        """
+        Load an active user with roles and permissions eagerly fetched.
+
+        The is_active filter lives in the WHERE clause, so a deactivated
+        account costs one empty index probe instead of being hydrated
+        (row, roles, permissions) only to be rejected in Python.
+
+        In DEBUG mode a raiseload("*") guard is attached so any relationship
+        that wasn't eager-loaded fails loudly during development instead of
+        silently becoming an N+1 lazy query in production.
+        """
+        options = [selectinload(User.roles).selectinload(Role.permissions)]
+        if settings.DEBUG:
+            options.append(raiseload("*"))
+
+        return db.query(User).options(*options).filter(
+            User.id == user_id,
+            User.is_active == True  # noqa: E712
+        ).first()
+
     @staticmethod
     async def get_current_user(
         credentials: HTTPAuthCredentials = Depends(security),
@@ -200,17 +385,33 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"}
             )
         
-        user = db.query(User).filter(User.id == user_id).first()
+        cached = _USER_CACHE.get(user_id)
+        if cached is not None and cached[0] > time.time():
+            # Attach the cached (detached) instance to this request's
+            # session so downstream mutations (role assignment, profile
+            # updates) actually flush instead of silently no-opping on a
+            # detached object; load=False skips the SELECT that the cache
+            # exists to avoid
+            user = db.merge(cached[1], load=False)
+        else:
+            user = AuthService.load_user_for_auth(db, user_id)
+            if user:
+                if len(_USER_CACHE) >= _USER_CACHE_MAX:
+                    _USER_CACHE.clear()
+                _USER_CACHE[user_id] = (time.time() + _USER_CACHE_TTL, user)
+
+        # load_user_for_auth filters on is_active in SQL, so missing and
+        # deactivated accounts land here together: same 401 either way,
+        # which also avoids disclosing which accounts exist
         if not user:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-        
-        if not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="User account is inactive"
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired token",
+                headers={"WWW-Authenticate": "Bearer"}
             )
-        
+
+        # Throttled last_activity bump for any session row tied to this
+        # token - at most one UPDATE per session per minute
+        activity_buffer.touch_session(db, token)
+
         return user
@@ -6,11 +6,92 @@ Version: 1.0.0
 """
 
 import logging
+import time
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from user_management.models import User, Role, Permission
+from user_management.config import settings
+from user_management.models import User, Role, Permission, user_roles, role_permissions
+from user_management.services.auth import invalidate_user_cache
 
 logger = logging.getLogger(__name__)
 
+# In-memory RBAC cache: user_id -> frozenset of permission names.
+# Warmed with a single JOIN query; consulted by permission checks when
+# settings.RBAC_CACHE_ENABLED is on. Invalidate on role changes.
+RBAC_CACHE = {}
+
+
+def warm_rbac_cache(db: Session) -> int:
+    """
+    Populate RBAC_CACHE from one flat JOIN across user_roles,
+    role_permissions, and permissions. Returns the number of cached users.
+    """
+    rows = db.execute(
+        select(user_roles.c.user_id, Permission.name)
+        .select_from(user_roles)
+        .join(role_permissions, role_permissions.c.role_id == user_roles.c.role_id)
+        .join(Permission, Permission.id == role_permissions.c.permission_id)
+    ).all()
+
+    fresh = {}
+    for user_id, perm_name in rows:
+        fresh.setdefault(user_id, set()).add(perm_name)
+
+    RBAC_CACHE.clear()
+    RBAC_CACHE.update({uid: frozenset(perms) for uid, perms in fresh.items()})
+
+    logger.info(f"✅ RBAC cache warmed: {len(RBAC_CACHE)} users")
+    return len(RBAC_CACHE)
+
+
+# Memoized boolean check results: (user_id, check_name) -> (expires_at, bool).
+# check_permission/check_role/is_admin run on every RBAC-gated request and
+# their answers are stable for seconds; a short TTL turns the repeat work
+# into a dict hit. Invalidated together with RBAC_CACHE on role changes.
+_CHECK_CACHE = {}
+_CHECK_CACHE_TTL = 30  # seconds
+_CHECK_CACHE_MAX = 50_000
+
+
+def _cached_check(user_id: int, key: str, compute) -> bool:
+    """TTL-memoize a per-user boolean check, computing on miss"""
+    cache_key = (user_id, key)
+    entry = _CHECK_CACHE.get(cache_key)
+    now = time.time()
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    result = compute()
+    if len(_CHECK_CACHE) >= _CHECK_CACHE_MAX:
+        _CHECK_CACHE.clear()
+    _CHECK_CACHE[cache_key] = (now + _CHECK_CACHE_TTL, result)
+    return result
+
+
+def _refresh_user_rbac_entry(db: Session, user_id: int):
+    """Recompute one user's RBAC_CACHE entry after a role change"""
+    if not settings.RBAC_CACHE_ENABLED:
+        return
+    rows = db.execute(
+        select(func.unnest(Role.permissions_cache))
+        .select_from(user_roles)
+        .join(Role, Role.id == user_roles.c.role_id)
+        .where(user_roles.c.user_id == user_id)
+        .distinct()
+    ).scalars()
+    RBAC_CACHE[user_id] = frozenset(rows)
+
+
+def invalidate_rbac_cache(user_id: int = None):
+    """Drop one user's cached permissions and checks, or the whole cache"""
+    if user_id is None:
+        RBAC_CACHE.clear()
+        _CHECK_CACHE.clear()
+    else:
+        RBAC_CACHE.pop(user_id, None)
+        for cache_key in [k for k in _CHECK_CACHE if k[0] == user_id]:
+            _CHECK_CACHE.pop(cache_key, None)
+
 
 class RBACService:
     """Role-Based Access Control service"""
@@ -20,24 +101,30 @@ class RBACService:
         """Check if user has specific permission"""
         if not user or not user.is_active:
             return False
-        
-        return user.has_permission(permission_name)
+
+        if settings.RBAC_CACHE_ENABLED and user.id in RBAC_CACHE:
+            return permission_name in RBAC_CACHE[user.id]
+
+        return _cached_check(
+            user.id, f"perm:{permission_name}",
+            lambda: user.has_permission(permission_name)
+        )
     
     @staticmethod
     def check_role(user: User, role_name: str) -> bool:
         """Check if user has specific role"""
         if not user or not user.is_active:
             return False
-        
-        return user.has_role(role_name)
+
+        return _cached_check(user.id, f"role:{role_name}", lambda: user.has_role(role_name))
     
     @staticmethod
     def is_admin(user: User) -> bool:
         """Check if user is admin"""
         if not user or not user.is_active:
             return False
-        
-        return user.is_admin()
+
+        return _cached_check(user.id, "is_admin", user.is_admin)
     
     @staticmethod
     def assign_role(db: Session, user: User, role_name: str, assigned_by: User = None) -> bool:
@@ -54,7 +141,10 @@ class RBACService:
         
         user.roles.append(role)
         db.commit()
-        
+        invalidate_rbac_cache(user.id)
+        invalidate_user_cache(user.id)
+        _refresh_user_rbac_entry(db, user.id)
+
         logger.info(f"✅ Role assigned: {user.email} -> {role_name}")
         return True
     
@@ -73,16 +163,35 @@ class RBACService:
         
         user.roles.remove(role)
         db.commit()
-        
+        invalidate_rbac_cache(user.id)
+        invalidate_user_cache(user.id)
+        _refresh_user_rbac_entry(db, user.id)
+
         logger.info(f"✅ Role removed: {user.email} -> {role_name}")
         return True
     
     @staticmethod
-    def get_user_permissions(user: User) -> set:
+    def get_user_permissions(user: User, db: Session = None) -> set:
         """Get all permissions for user"""
         if not user or not user.is_active:
             return set()
-        
+
+        if settings.RBAC_CACHE_ENABLED and user.id in RBAC_CACHE:
+            return set(RBAC_CACHE[user.id])
+
+        # With a session in hand, read straight from the materialized
+        # roles.permissions_cache column (maintained by the DB trigger) -
+        # one JOIN through user_roles, no role_permissions/permissions walk
+        if db is not None:
+            rows = db.execute(
+                select(func.unnest(Role.permissions_cache))
+                .select_from(user_roles)
+                .join(Role, Role.id == user_roles.c.role_id)
+                .where(user_roles.c.user_id == user.id)
+                .distinct()
+            ).scalars()
+            return set(rows)
+
         return user.get_permissions()
     
     @staticmethod